@@ -0,0 +1,253 @@
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import re
+import sys
+import time
+import types
+from PIL import Image, ImageDraw
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+baseline_file = os.path.join(base_dir, "bench_baseline.json")
+gocomics_image = "https://assets.amuniversal.com/d68d40905e11012ee3bf00163e41dd5b"  # The strip saved in out.txt
+image_sizes = [(800, 480), (1200, 900), (1800, 1800)]  # Synthetic source sizes, panel size up to muttsScraper's 1800px
+
+
+class OfflineEPD:
+    """Stands in for epd7in5_V2.EPD so the pipeline can be timed without a panel."""
+    width = 800
+    height = 480
+
+    def init(self):
+        pass
+
+    def init_4Gray(self):
+        pass
+
+    def getbuffer(self, image):
+        # Same packing as the waveshare driver: 1 bit per pixel, inverted
+        img = image
+        if img.size == (self.height, self.width):
+            img = img.rotate(90, expand=True)
+        buf = bytearray(img.convert('1').tobytes('raw'))
+        for i in range(len(buf)):
+            buf[i] ^= 0xFF
+        return buf
+
+    def getbuffer_4Gray(self, image):
+        # Same packing as the waveshare driver: 2 bits per pixel, 4 pixels per byte
+        buf = [0xFF] * (int(self.width / 4) * self.height)
+        img = image.convert('L')
+        pixels = img.load()
+        i = 0
+        for y in range(self.height):
+            for x in range(self.width):
+                if pixels[x, y] == 0xC0:
+                    pixels[x, y] = 0x80
+                elif pixels[x, y] == 0x80:
+                    pixels[x, y] = 0x40
+                i = i + 1
+                if i % 4 == 0:
+                    buf[int((x + (y * self.width)) / 4)] = ((pixels[x-3, y] & 0xc0) | (pixels[x-2, y] & 0xc0) >> 2 | (pixels[x-1, y] & 0xc0) >> 4 | (pixels[x, y] & 0xc0) >> 6)
+        return buf
+
+
+def load_panel():
+    """Returns an EPD to pack buffers with, never touching the panel itself."""
+    try:
+        from waveshare_epd import epd7in5_V2
+        # The constructor only records pin numbers, init() is what talks to the panel
+        return epd7in5_V2.EPD()
+    except (ImportError, RuntimeError):
+        # No driver on this machine, let the display modules import against the stand-in
+        driver = types.ModuleType("waveshare_epd")
+        driver.epd7in5_V2 = types.ModuleType("waveshare_epd.epd7in5_V2")
+        driver.epd7in5_V2.EPD = OfflineEPD
+        sys.modules.setdefault("waveshare_epd", driver)
+        sys.modules.setdefault("waveshare_epd.epd7in5_V2", driver.epd7in5_V2)
+        return OfflineEPD()
+
+
+def make_image(width, height, seed=0):
+    """Synthetic strip: panel borders, line art and a shaded gradient."""
+    rng = random.Random(seed)
+    img = Image.linear_gradient('L').resize((width, height))
+    draw = ImageDraw.Draw(img)
+    panels = 3 if width > height else 2
+    panel_width = width // panels
+    for p in range(panels):
+        x0 = p * panel_width + 10
+        draw.rectangle([x0, 10, x0 + panel_width - 20, height - 10], outline=0, width=4)
+        for _ in range(40):
+            x = rng.randint(x0, x0 + panel_width - 20)
+            y = rng.randint(10, height - 10)
+            draw.line([x, y, x + rng.randint(-80, 80), y + rng.randint(-80, 80)], fill=0, width=2)
+        draw.ellipse([x0 + 30, 40, x0 + 130, 140], fill=255, outline=0, width=3)
+    return img
+
+
+def make_line_art(width, height, lines=1500, seed=0):
+    """Synthetic black and white strip, dense enough that downscaling leaves lots of grey edges."""
+    rng = random.Random(seed)
+    img = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(img)
+    for _ in range(lines):
+        x = rng.randint(0, width)
+        y = rng.randint(0, height)
+        draw.line([x, y, x + rng.randint(-120, 120), y + rng.randint(-120, 120)], fill=0, width=rng.choice([2, 3, 4]))
+    return img
+
+
+def ingested(img):
+    # Round trip through ingest so the classifier sees what the store actually holds
+    from ingest import normalize
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return Image.open(io.BytesIO(normalize(out.getvalue())))
+
+
+def render_mutts_page(page, cards=24):
+    """Output.txt was saved before the product grid rendered, build the grid the browser would from the theme's card template."""
+    template = re.search(r'<img id="product-image-\{\{ product\.id \}\}"[^>]*/>', page).group(0)
+    template = re.sub(r'\{% if image\.src %\}.*?\{% endif %\}', 'src="{src}"', template)
+    template = template.replace("{{ product.id }}", "{id}").replace("{{ product.title | escape }}", "MUTTS")
+    urls = [f"https://mutts.com/cdn/shop/products/strip-{n:04d}.jpg?v=1" for n in range(1, cards + 1)]
+    grid = "".join(f'<div class="boost-sd__product-item">{template.format(id=n, src=url[len("https:"):])}</div>'
+                   for n, url in enumerate(urls, 1))
+    return page.replace("</body>", f'<div class="boost-sd__product-list">{grid}</div></body>', 1), urls
+
+
+def expect(stage, ok, message):
+    # A stage that stops finding anything gets faster, fail loudly instead of reporting a speedup
+    if not ok:
+        raise RuntimeError(f"{stage}: {message}")
+
+
+def time_stage(func, repeat):
+    """Best wall time in ms over repeat runs, and the last result."""
+    best = None
+    result = func()  # Untimed warm-up so one-off setup costs don't land on the first size
+    gc.disable()  # Same as timeit, keep collections out of the measurement
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = (time.perf_counter() - start) * 1000
+            if best is None or elapsed < best:
+                best = elapsed
+    finally:
+        gc.enable()
+    return best, result
+
+
+def run_benchmarks(repeat):
+    panel = load_panel()
+    from comic_displayer import EinkImageProcessor
+    from poemDisplay import EpaperDisplay, wrap_lines
+    from dailyscraper import parse_comic_page
+    from muttsScraper import parse_comic_images
+
+    # Passing the epd in skips the constructors' epd.init()
+    processor = EinkImageProcessor(use_4gray=False, epd=panel)
+    display = EpaperDisplay(epd=panel)
+
+    results = {}
+    line_art = ingested(make_line_art(1800, 600))
+    shaded = ingested(make_image(1800, 600))
+    results["classify_line_art"], use_4gray = time_stage(lambda: processor.has_tonal_content(line_art), repeat)
+    expect("classify_line_art", not use_4gray, "downscaled line art picked the 4-gray refresh")
+    results["classify_shaded"], use_4gray = time_stage(lambda: processor.has_tonal_content(shaded), repeat)
+    expect("classify_shaded", use_4gray, "shaded strip picked the 2-color refresh")
+
+    for width, height in image_sizes:
+        size = f"{width}x{height}"
+        source = make_image(width, height)
+        results[f"classify[{size}]"], _ = time_stage(
+            lambda: processor.has_tonal_content(source), repeat)
+        results[f"resize[{size}]"], fitted = time_stage(
+            lambda: processor._resize_image(source, panel.width, panel.height), repeat)
+
+    # Everything after the resize works on a panel sized frame whatever the source was, so time it once
+    results["enhance"], enhanced = time_stage(lambda: processor._enhance_image(fitted), repeat)
+    results["dither"], dithered = time_stage(lambda: processor._apply_dithering(enhanced), repeat)
+    results["4gray"], grayed = time_stage(lambda: processor._process_4gray(enhanced), repeat)
+    results["pack"], _ = time_stage(lambda: panel.getbuffer(dithered), repeat)
+    results["pack_4gray"], _ = time_stage(lambda: panel.getbuffer_4Gray(grayed), repeat)
+
+    with open(os.path.join(base_dir, "A_CHARACTER.txt"), "r") as f:
+        poem = f.read().strip().split("\n")
+    chunk = poem[:30]
+    results["poem_wrap"], _ = time_stage(lambda: wrap_lines(poem), repeat)
+    results["poem_render"], _ = time_stage(lambda: display.create_text_image(chunk), repeat)
+
+    with open(os.path.join(base_dir, "out.txt"), "r", encoding="utf-8") as f:
+        gocomics_page = f.read()
+    with open(os.path.join(base_dir, "Output.txt"), "r", encoding="utf-8") as f:
+        mutts_page, mutts_urls = render_mutts_page(f.read())
+    results["parse_gocomics"], (image_url, next_url) = time_stage(lambda: parse_comic_page(gocomics_page), repeat)
+    expect("parse_gocomics", image_url == gocomics_image,
+           f"expected image {gocomics_image}, got {image_url}")
+    results["parse_mutts"], comics = time_stage(lambda: parse_comic_images(mutts_page), repeat)
+    expect("parse_mutts", mutts_urls and comics == mutts_urls,
+           f"expected {len(mutts_urls)} strip URLs, got {comics}")
+
+    return results
+
+
+def load_baseline(filename):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(filename, results):
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the display pipeline stages without the panel or network.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage, the best one is kept")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown over baseline, 0.25 = 25%%")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="ignore slowdowns smaller than this, in ms")
+    parser.add_argument("--baseline", default=baseline_file, help="baseline results file")
+    parser.add_argument("--save", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    try:
+        results = run_benchmarks(args.repeat)
+    except RuntimeError as e:
+        print(f"Benchmark check failed: {e}")
+        return 1
+    baseline = load_baseline(args.baseline)
+
+    regressions = []
+    print(f"{'stage':<28}{'ms':>10}{'baseline':>10}{'change':>9}")
+    for stage, ms in results.items():
+        if stage in baseline:
+            change = ms / baseline[stage] - 1
+            flag = ""
+            if change > args.threshold and ms - baseline[stage] > args.min_ms:
+                regressions.append(stage)
+                flag = "  REGRESSED"
+            print(f"{stage:<28}{ms:>10.2f}{baseline[stage]:>10.2f}{change:>+9.0%}{flag}")
+        else:
+            print(f"{stage:<28}{ms:>10.2f}{'-':>10}{'-':>9}")
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} stage(s) slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
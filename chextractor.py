@@ -5,7 +5,9 @@ from PIL import Image
 
 import fitz  # PyMuPDF
 
-import os
+from comic_store import ComicStore
+
+from ingest import normalize
 
 
 
@@ -13,11 +15,9 @@ import os
 
 pdf_path = "./mnt/c+h.pdf"
 
-output_dir = "./mnt/calvin_hobbes_comics"
-
-# Create output directory if it doesn't exist
+series = "ch"
 
-os.makedirs(output_dir, exist_ok=True)
+store = ComicStore()
 
 
 
@@ -44,11 +44,13 @@ for page_number in range(1351):
         rect = fitz.Rect(x0=9, y0=170, x1=pix.width-10, y1=605)
         print(f"Rect: x0={rect.x0}, y0={rect.y0}, x1={rect.x1}, y1={rect.y1}")
 
+        if store.has(series, comic_count):
+            continue
+
         comic_pix = page.get_pixmap(clip=rect)
-        output_path = os.path.join(output_dir, f"{comic_count}_ch.png")
-        comic_pix.save(output_path)
+        blob_hash, created = store.add(series, comic_count, normalize(comic_pix.tobytes("png")))
 
-        print(f"Saved: {output_path}")
+        print(f"Saved: {series} #{comic_count} as {blob_hash[:12]}{'' if created else ' (duplicate)'}")
 
     else:  # Save daily comics individually
         print("Daily PAGENumber", page_number)
@@ -67,10 +69,12 @@ for page_number in range(1351):
             else:
                 rect = fitz.Rect(x0=25, y0=(comic_index+1) * page_height + 35, x1=page_width, y1=(comic_index+2) * page_height+60)
 
+            if store.has(series, comic_count):
+                continue
+
             comic_pix = page.get_pixmap(clip=rect)  # Extract only this section
 
             # Save the extracted comic
-            output_path = os.path.join(output_dir, f"{comic_count}_ch.png")
-            comic_pix.save(output_path)
-            print(f"Saved: {output_path}")
+            blob_hash, created = store.add(series, comic_count, normalize(comic_pix.tobytes("png")))
+            print(f"Saved: {series} #{comic_count} as {blob_hash[:12]}{'' if created else ' (duplicate)'}")
 
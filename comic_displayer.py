@@ -1,26 +1,51 @@
 import time
 import os
 from waveshare_epd import epd7in5_V2
-from PIL import Image, ImageDraw, ImageFont, ImageEnhance, ImageFilter
+from PIL import Image, ImageDraw, ImageFont, ImageEnhance, ImageFilter, ImageChops
 
 base_folder = "/comic_strips"  # Base folder where images are stored 
 display_interval = 5  # Time in seconds between updates ##TODO
+tonal_threshold = 0.05  # Share of flat midtone pixels above which a strip is worth the slower 4-gray refresh
+flat_spread = 40  # Max 3x3 brightness range for a pixel to count as part of a flat area rather than an edge
+def frame_path(image_path):
+    # Where watch.py puts the display-ready render of a strip, beside it in the day folder
+    folder, name = os.path.split(image_path)
+    return os.path.join(folder, "frames", name)
+
 class EinkImageProcessor:
-    def __init__(self, use_4gray=True):
-        self.epd = epd7in5_V2.EPD()
+    def __init__(self, use_4gray=True, epd=None):
+        # A passed in epd is shared with other displays and already initialised by its owner
         self.use_4gray = use_4gray
+        if epd is not None:
+            self.epd = epd
+            return
+        self.epd = epd7in5_V2.EPD()
         self.epd.init()
         if use_4gray:
             print("Use 4Gray")
             self.epd.init_4Gray()
         
     def enhance_and_fit_image(self, image_path):
+        return self.prepare_frame(image_path, self.use_4gray)[1]
+
+    def prepare_frame(self, image_path, use_4gray=None):
+        # Returns (use_4gray, processed image), use_4gray=None picks the mode from the image itself
+        rendered = frame_path(image_path)
+        if use_4gray is None and os.path.exists(rendered) and os.path.getmtime(rendered) >= os.path.getmtime(image_path):
+            # Already rendered by watch.py, 2-color frames are saved as '1' and 4-gray ones as 'L'
+            img = Image.open(rendered)
+            img.load()
+            return img.mode == 'L', img
+
         # Load the image
         img = Image.open(image_path)
         screen_width, screen_height = self.epd.width, self.epd.height
         
         # Convert to grayscale with enhanced bit depth
         img = img.convert('L')
+
+        if use_4gray is None:
+            use_4gray = self.has_tonal_content(img)
         
         # Apply subtle Gaussian blur to reduce noise before processing
         img = img.filter(ImageFilter.GaussianBlur(radius=0.5))
@@ -31,7 +56,7 @@ class EinkImageProcessor:
         # Enhance image
         img = self._enhance_image(img)
         
-        if not self.use_4gray:
+        if not use_4gray:
             # Apply binary dithering for 2-color mode
             # print("hello")
             img = self._apply_dithering(img)
@@ -39,7 +64,32 @@ class EinkImageProcessor:
             # Process for 4-gray display
             img = self._process_4gray(img)
         
-        return img
+        return use_4gray, img
+
+    def has_tonal_content(self, img):
+        # Line art is nearly all black and white, shading shows up as areas of midtones.
+        # Downscaled line edges are midtones too but sit between black and white, so only
+        # count midtone pixels whose 3x3 neighbourhood is flat.
+        # Measured on the unpadded source, white letterboxing would dilute it otherwise
+        spread = ImageChops.subtract(img.filter(ImageFilter.MaxFilter(3)), img.filter(ImageFilter.MinFilter(3)))
+        flat = spread.point(lambda v: 255 if v < flat_spread else 0)
+        midtones = img.point(lambda v: 255 if 48 <= v <= 208 else 0)
+        shaded = ImageChops.multiply(flat, midtones).histogram()[255]
+        return shaded > tonal_threshold * img.width * img.height
+
+    def switch_mode(self, use_4gray):
+        # Re-init only when the waveform changes, every switch costs a full init.
+        # use_4gray None means the panel isn't initialised (asleep or not started yet)
+        if use_4gray == self.use_4gray:
+            return
+        self.epd.init()
+        if use_4gray:
+            self.epd.init_4Gray()
+        self.use_4gray = use_4gray
+
+    def sleep(self):
+        self.epd.sleep()
+        self.use_4gray = None
     def _resize_image(self, img, target_width, target_height):
         # Calculate aspect ratios
         img_ratio = img.width / img.height
@@ -149,15 +199,19 @@ class EinkImageProcessor:
         return img.convert('1', dither=Image.FLOYDSTEINBERG)
     
     def display_image(self, image_path):
-        
-        final_image = self.enhance_and_fit_image(image_path)
-        
+        # Pick the mode from the strip and (re)initialise the panel for it, it may be asleep
+        use_4gray, final_image = self.prepare_frame(image_path)
+        self.switch_mode(use_4gray)
+        self.display_frame(final_image)
+            
+        time.sleep(5)
+
+    def display_frame(self, final_image):
+        # Push an already processed image to the panel
         if self.use_4gray:
             self.epd.display_4Gray(self.epd.getbuffer_4Gray(final_image))
         else:
             self.epd.display(self.epd.getbuffer(final_image))
-            
-        time.sleep(5)
              
     def clear(self):
         if self.use_4gray:
@@ -207,9 +261,15 @@ def main():
         if not images:
             print(f"No images found for day {day} in folder: {folder}")
         else:
+            # Pick each strip's mode up front, then show same-mode strips back to back
+            frames = [processor.prepare_frame(image_path) for image_path in images]
+            # Stable sort, starting with whichever mode the panel is already in
+            frames.sort(key=lambda frame: frame[0] != processor.use_4gray)
             for _ in range(1): ##TODO
-                for image_path in images:
-                    processor.display_image(image_path)
+                for use_4gray, final_image in frames:
+                    processor.switch_mode(use_4gray)
+                    processor.display_frame(final_image)
+                    time.sleep(5)  # Same hold as display_image
                     time.sleep(display_interval)  # Wait before displaying the next image
                     # processor.clear()
 
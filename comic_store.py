@@ -0,0 +1,152 @@
+import hashlib
+import io
+import os
+import shutil
+import sqlite3
+from PIL import Image
+
+store_folder = "./library"  # Shared store all the ingest tools write into
+hash_size = 16  # dHash grid, 16 gives a 256 bit hash
+near_duplicate_bits = 10  # Max differing dHash bits for a strip to be recorded as a likely re-encode of another
+
+
+def dhash(img, size=hash_size):
+    """Difference hash of an image as an int, computed on a (size+1) x size grayscale thumbnail."""
+    # Let JPEG decode at reduced scale, the thumbnail is all we need
+    img.draft('L', (size * 8, size * 8))
+    small = img.convert('L').resize((size + 1, size), Image.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for y in range(size):
+        row = pixels[y * (size + 1):(y + 1) * (size + 1)]
+        for x in range(size):
+            # One level of slack keeps compression noise in flat areas from flipping bits
+            value = (value << 1) | (row[x] > row[x + 1] + 1)
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class ComicStore:
+    """Blobs kept once by sha256, plus a table mapping (series, index) to a blob.
+
+    Only identical bytes share a blob. A new blob whose dHash is within
+    near_duplicate_bits of one already stored for the same series, with the
+    same aspect ratio, is still stored, but its strip row records that blob
+    and the Hamming distance as a likely re-encode. Reused art (same panels,
+    new balloon text) lands that close too, so a match is never merged on the
+    dHash alone. Strips with no near match leave both NULL.
+    """
+
+    def __init__(self, root=store_folder):
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, "library.db"))
+        self.db.execute("""CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY, ext TEXT, dhash TEXT, width INTEGER, height INTEGER, size INTEGER)""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS strips (
+            series TEXT, idx INTEGER, hash TEXT REFERENCES blobs(hash), distance INTEGER,
+            near TEXT REFERENCES blobs(hash), PRIMARY KEY (series, idx))""")
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(strips)")]
+        # Stores made before near duplicates were recorded
+        if "distance" not in columns:
+            self.db.execute("ALTER TABLE strips ADD COLUMN distance INTEGER")
+        if "near" not in columns:
+            self.db.execute("ALTER TABLE strips ADD COLUMN near TEXT REFERENCES blobs(hash)")
+        self.db.commit()
+        # dHashes stay in memory per series so near-duplicate lookups never hit the disk
+        self._dhashes = {}
+        for series, blob_hash, value, width, height in self.db.execute(
+                "SELECT DISTINCT strips.series, blobs.hash, blobs.dhash, blobs.width, blobs.height "
+                "FROM strips JOIN blobs ON strips.hash = blobs.hash"):
+            self._dhashes.setdefault(series, []).append((blob_hash, int(value, 16), width, height))
+
+    def close(self):
+        self.db.close()
+
+    def blob_path(self, blob_hash, ext):
+        return os.path.join(self.root, "blobs", blob_hash[:2], blob_hash + ext)
+
+    def has(self, series, index):
+        row = self.db.execute("SELECT 1 FROM strips WHERE series = ? AND idx = ?", (series, index)).fetchone()
+        return row is not None
+
+    def path_for(self, series, index):
+        """Path of the blob stored for series/index, or None."""
+        row = self.db.execute(
+            "SELECT blobs.hash, blobs.ext FROM strips JOIN blobs ON strips.hash = blobs.hash "
+            "WHERE strips.series = ? AND strips.idx = ?", (series, index)).fetchone()
+        return self.blob_path(*row) if row else None
+
+    def strips(self, series=None):
+        """Yields (series, index, blob path) for every stored strip, ordered by index."""
+        query = ("SELECT strips.series, strips.idx, blobs.hash, blobs.ext FROM strips "
+                 "JOIN blobs ON strips.hash = blobs.hash")
+        params = ()
+        if series is not None:
+            query += " WHERE strips.series = ?"
+            params = (series,)
+        for row_series, index, blob_hash, ext in self.db.execute(query + " ORDER BY strips.idx, strips.series", params):
+            yield row_series, index, self.blob_path(blob_hash, ext)
+
+    def strips_since(self, rowid):
+        """Yields (rowid, series, index, blob path) for strips stored or replaced after rowid."""
+        # INSERT OR REPLACE gives a replaced strip a fresh rowid, so it shows up here again
+        for row in self.db.execute(
+                "SELECT strips.rowid, strips.series, strips.idx, blobs.hash, blobs.ext FROM strips "
+                "JOIN blobs ON strips.hash = blobs.hash WHERE strips.rowid > ? ORDER BY strips.rowid", (rowid,)):
+            yield row[0], row[1], row[2], self.blob_path(row[3], row[4])
+
+    def _find_near_duplicate(self, series, value, width, height):
+        """Returns (blob hash, distance) of the closest same-series match, or (None, None)."""
+        ratio = width / height
+        best, best_distance = None, None
+        # Different series can share a layout closely enough to collide, so never match across them
+        for blob_hash, other, other_width, other_height in self._dhashes.get(series, []):
+            # Re-encodes keep their shape, so only compare strips of (nearly) the same aspect ratio
+            if abs(other_width / other_height - ratio) > 0.02 * ratio:
+                continue
+            distance = hamming(value, other)
+            if distance <= near_duplicate_bits and (best_distance is None or distance < best_distance):
+                best, best_distance = blob_hash, distance
+        return best, best_distance
+
+    def add(self, series, index, data, ext=".png"):
+        """Stores image bytes as series/index and returns (blob hash, whether a new blob was written)."""
+        blob_hash = hashlib.sha256(data).hexdigest()
+        exists = self.db.execute("SELECT 1 FROM blobs WHERE hash = ?", (blob_hash,)).fetchone()
+        created = False
+        near, distance = None, None
+        if not exists:
+            img = Image.open(io.BytesIO(data))
+            width, height = img.size
+            value = dhash(img)
+            near, distance = self._find_near_duplicate(series, value, width, height)
+            if near:
+                print(f"{series} #{index} looks like a re-encode of {near[:12]} ({distance} bits apart), keeping both")
+            path = self.blob_path(blob_hash, ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so a crash never leaves a partial blob behind
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self.db.execute("INSERT INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                            (blob_hash, ext, format(value, "x"), width, height, len(data)))
+            self._dhashes.setdefault(series, []).append((blob_hash, value, width, height))
+            created = True
+        self.db.execute("INSERT OR REPLACE INTO strips (series, idx, hash, distance, near) VALUES (?, ?, ?, ?, ?)",
+                        (series, index, blob_hash, distance, near))
+        self.db.commit()
+        return blob_hash, created
+
+
+def link_or_copy(source, destination):
+    # Hard links keep the day layout free, fall back to a copy across filesystems
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy(source, destination)
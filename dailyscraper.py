@@ -1,7 +1,10 @@
-import os
+import argparse
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
+from comic_store import ComicStore
+from ingest import ingest_image
+from http_cache import add_cache_arguments, cache_from_args
 #lio/2006/05/15
 #pearlsbeforeswine 2002/01/07
 #wallace-the-brave/2015/07/06
@@ -14,64 +17,71 @@ from datetime import datetime, timedelta
 #foxtrot/2006/01/ 02
 
 # bignate/1991/01/07
-def download_comic(url, output_folder, total, comic):
+def parse_comic_page(html):
+    """Returns (image_url, next_url) from a GoComics strip page, either may be None."""
+    soup = BeautifulSoup(html, "html.parser")
+    comic_img = soup.select_one("picture.item-comic-image img")
+    image_url = comic_img.get("src") if comic_img else None
+
+    # Find the 'Next' button link
+    next_url = None
+    next_link_tag = soup.select_one('a.fa-caret-right')
+    if next_link_tag:
+        next_url = next_link_tag.get('href')
+        if next_url and not next_url.startswith('http'):
+            next_url = "https://www.gocomics.com" + next_url
+    return image_url, next_url
+
+def download_comic(url, store, total, comic, cache=None):
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     }
 
-    response = requests.get(url, headers=headers)
+    get = cache.get if cache is not None else requests.get
+    response = get(url, headers=headers)
     if response.status_code != 200:
         print(f"Failed to load page {url}, status: {response.status_code}")
         return None
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    comic_img = soup.select_one("picture.item-comic-image img")
+    image_url, next_url = parse_comic_page(response.text)
 
-    if not comic_img:
+    if not image_url:
         print(f"No comic image found at {url}")
         return None
 
-    image_url = comic_img.get("src")
-    if not image_url:
-        print(f"No image URL found at {url}")
-        return None
+    if store.has(comic, total):
+        # Already stored by an earlier run, only the next link was needed
+        print(f"Already have comic #{total} from {url}")
+        return next_url
 
-    filename = f"{total}_{comic}.png"
-    filepath = os.path.join(output_folder, filename)
+    stored = ingest_image(image_url, headers, store, comic, total, cache)
+    if stored:
+        blob_hash, created = stored
+        print(f"Downloaded comic #{total} from {url} as {blob_hash[:12]}{'' if created else ' (duplicate)'}")
 
-    img_response = requests.get(image_url, headers=headers)
-    if img_response.status_code == 200:
-        with open(filepath, "wb") as f:
-            f.write(img_response.content)
-        print(f"Downloaded comic #{total} from {url} as {filename}")
-    else:
-        print(f"Failed to download image from {image_url}, status: {img_response.status_code}")
+    return next_url
 
-    # Find the 'Next' button link
-    next_link_tag = soup.select_one('a.fa-caret-right')
-    if next_link_tag:
-        next_url = next_link_tag.get('href')
-        if next_url and not next_url.startswith('http'):
-            next_url = "https://www.gocomics.com" + next_url
-        return next_url
-    else:
-        # No next link found
-        return None
+def main():
+    parser = argparse.ArgumentParser(description="Download a GoComics strip run into the library.")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    cache = cache_from_args(args)
+
+    # Configuration foxtrot/2006/01/02
+    comic = "bignate"
+    store = ComicStore()
 
-# Configuration foxtrot/2006/01/02
-comic = "bignate"
-output_folder = f"{comic}_comics"
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
+    start_url = "https://www.gocomics.com/bignate/1991/05/29"
+    current_url = start_url
+    total = 139
 
-start_url = "https://www.gocomics.com/bignate/1991/05/29"
-current_url = start_url
-total = 139
+    while current_url and total != 3151:
+        current_url = download_comic(current_url, store, total, comic, cache)
+        if current_url:
+            total += 1
+        else:
+            print("No more comics found. Exiting loop.")
+            break
 
-while current_url and total != 3151:
-    current_url = download_comic(current_url, output_folder, total, comic)
-    if current_url:
-        total += 1
-    else:
-        print("No more comics found. Exiting loop.")
-        break
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import time
+
+socket_path = "/tmp/epaper.sock"  # Where the daemon listens and triggers connect
+chunk_size = 30  # Poem lines per page, same as poemDisplay
+
+
+class DisplayDaemon:
+    """Owns the panel and the display processors for the life of the process."""
+
+    def __init__(self):
+        from waveshare_epd import epd7in5_V2
+        from comic_displayer import EinkImageProcessor
+        from poemDisplay import EpaperDisplay
+
+        self.epd = epd7in5_V2.EPD()
+        # The comic processor tracks the panel's waveform for everything drawn on it
+        self.comics = EinkImageProcessor(use_4gray=None, epd=self.epd)
+        self.poems = EpaperDisplay(epd=self.epd)
+        self.comics.switch_mode(False)
+
+    def show_image(self, path, gray=None):
+        # gray=None lets the processor pick the mode from the image's tonal content
+        gray, final_image = self.comics.prepare_frame(path, gray)
+        self.comics.switch_mode(gray)
+        self.comics.display_frame(final_image)
+        return "4gray" if gray else "2color"
+
+    def show_poem(self, path, page=0):
+        with open(path, "r") as f:
+            lines = f.read().strip().split("\n")
+        chunks = [lines[i:i + chunk_size] for i in range(0, len(lines), chunk_size)]
+        image = self.poems.create_text_image(chunks[page % len(chunks)])
+        self.comics.switch_mode(False)
+        self.epd.display(self.epd.getbuffer(image))
+        return len(chunks)
+
+    def clear(self):
+        self.comics.switch_mode(False)
+        self.epd.Clear()
+
+    def sleep(self):
+        self.comics.sleep()
+
+    def handle(self, request):
+        """Runs one command dict and returns the reply dict."""
+        command = request.get("command")
+        start = time.perf_counter()
+        try:
+            if command == "show_image":
+                result = self.show_image(request["path"], request.get("gray"))
+            elif command == "show_poem":
+                result = self.show_poem(request["path"], request.get("page", 0))
+            elif command == "clear":
+                result = self.clear()
+            elif command == "sleep":
+                result = self.sleep()
+            else:
+                return {"ok": False, "error": f"Unknown command: {command}", "ms": (time.perf_counter() - start) * 1000}
+        except Exception as e:
+            logging.error(f"{command} failed: {e}")
+            return {"ok": False, "error": str(e), "ms": (time.perf_counter() - start) * 1000}
+        elapsed = (time.perf_counter() - start) * 1000
+        logging.info(f"{command} took {elapsed:.0f} ms")
+        reply = {"ok": True, "ms": elapsed}
+        if result is not None:
+            reply["result"] = result
+        return reply
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    # One JSON command per line, one JSON reply per line
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                reply = {"ok": False, "error": f"Bad request: {e}", "ms": 0}
+            else:
+                if isinstance(request, dict):
+                    reply = self.server.daemon.handle(request)
+                else:
+                    reply = {"ok": False, "error": "Bad request: expected a JSON object", "ms": 0}
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+
+
+def daemon_running(path):
+    """True if something is answering on the socket."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+    return True
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    # Requests are served one at a time, the panel can only do one thing at once
+    def __init__(self, path, daemon):
+        self.daemon = daemon
+        if os.path.exists(path):
+            # Only a socket left behind by a dead daemon may be replaced
+            os.remove(path)
+        super().__init__(path, CommandHandler)
+
+
+def serve(path):
+    logging.basicConfig(level=logging.INFO)
+    if daemon_running(path):
+        logging.error(f"Another daemon is already listening on {path}")
+        return 1
+    daemon = DisplayDaemon()
+    server = DaemonServer(path, daemon)
+    logging.info(f"Listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+        daemon.sleep()
+    return 0
+
+
+def send_command(request, path=socket_path):
+    """Sends one command to a running daemon and returns its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall((json.dumps(request) + "\n").encode())
+        sock.shutdown(socket.SHUT_WR)
+        reply = sock.makefile("r").readline()
+    return json.loads(reply)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident e-paper display daemon and its trigger client.")
+    parser.add_argument("--socket", default=socket_path, help="unix socket path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="run the daemon")
+    show_image = commands.add_parser("show_image", help="process and display an image")
+    show_image.add_argument("path")
+    show_image.add_argument("--mode", choices=("auto", "2color", "4gray"), default="auto", help="refresh waveform")
+    show_poem = commands.add_parser("show_poem", help="display one page of a poem")
+    show_poem.add_argument("path")
+    show_poem.add_argument("--page", type=int, default=0)
+    commands.add_parser("clear", help="clear the panel")
+    commands.add_parser("sleep", help="put the panel to sleep")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        return serve(args.socket)
+
+    request = {"command": args.command}
+    if args.command == "show_image":
+        request.update(path=os.path.abspath(args.path))
+        if args.mode != "auto":
+            request["gray"] = args.mode == "4gray"
+    elif args.command == "show_poem":
+        request.update(path=os.path.abspath(args.path), page=args.page)
+    try:
+        reply = send_command(request, args.socket)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"Daemon not running on {args.socket}")
+        return 1
+    print(json.dumps(reply))
+    return 0 if reply.get("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
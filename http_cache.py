@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+cache_folder = "./http_cache"  # Where recorded responses live
+modes = ("off", "record", "replay", "refresh")
+orphan_age = 3600  # Seconds before a .tmp or meta-less .body counts as abandoned rather than in progress
+low_water = 0.9  # Eviction for max_bytes trims down to this share, so it doesn't rerun on every put
+
+
+def decode_body(content, headers):
+    # Same charset rules as requests (ISO-8859-1 for text/* without one), so replay reads what a live fetch did
+    return content.decode(get_encoding_from_headers(headers) or "utf-8", errors="replace")
+
+
+class CachedResponse:
+    """The parts of requests.Response the scrapers use, backed by a cache entry."""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+    @property
+    def text(self):
+        return decode_body(self.content, self.headers)
+
+    def iter_content(self, chunk_size=8192):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class RecordingResponse:
+    """Wraps a streamed requests.Response and records the body as it is read.
+
+    The body goes into a temp file beside its cache entry. It only becomes an
+    entry once the caller has read all of it and validate(path) accepts it,
+    a caller that stops early (not an image, too big) leaves nothing behind.
+    """
+
+    def __init__(self, cache, url, response, validate=None):
+        self.cache = cache
+        self.url = url
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.validate = validate
+        self._content = None
+        meta_path, body_path = cache._paths("GET", url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(body_path), suffix=".tmp")
+        self.tmp_file = os.fdopen(fd, "wb")
+
+    def iter_content(self, chunk_size=8192):
+        size = 0
+        for chunk in self.response.iter_content(chunk_size):
+            self.tmp_file.write(chunk)
+            size += len(chunk)
+            yield chunk
+        self._finish(size)
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b"".join(self.iter_content())
+        return self._content
+
+    @property
+    def text(self):
+        return decode_body(self.content, self.headers)
+
+    def _finish(self, size):
+        self.tmp_file.close()
+        if self.validate is None or self.validate(self.tmp_path):
+            self.cache.commit(self.tmp_path, self.url, self.status_code, self.headers, size)
+        self.close()
+
+    def close(self):
+        if not self.tmp_file.closed:
+            self.tmp_file.close()
+        # Still here if the body was cut short or rejected
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class HttpCache:
+    """On-disk HTTP response cache keyed by method and URL.
+
+    record:  serve from the cache, fetch and store on a miss
+    replay:  serve from the cache only, a miss is a 504 like only-if-cached
+    refresh: always fetch and overwrite the cache
+    off:     plain requests, nothing read or written
+
+    Each entry is a body file plus a JSON file of status and headers.
+    Both are written to a temp file and renamed into place, with the JSON
+    last, so several workers can share one cache and a reader never sees
+    a half written entry.
+    """
+
+    def __init__(self, root=cache_folder, mode="record", max_age=None, max_bytes=None):
+        if mode not in modes:
+            raise ValueError(f"Unknown cache mode {mode}, expected one of {', '.join(modes)}")
+        self.root = root
+        self.mode = mode
+        self.max_age = max_age  # Seconds, None keeps entries forever
+        self.max_bytes = max_bytes  # Total body size, None is unbounded
+        self._total = 0  # Body bytes on disk as of the last evict, plus what this process added since
+        if mode in ("record", "refresh"):
+            os.makedirs(root, exist_ok=True)
+            self.evict()
+
+    def _paths(self, method, url):
+        key = hashlib.sha256(f"{method.upper()} {url}".encode()).hexdigest()
+        base = os.path.join(self.root, key[:2], key)
+        return base + ".json", base + ".body"
+
+    def _write(self, path, data):
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def lookup(self, method, url):
+        """Returns the cached response for method/url or None."""
+        meta_path, body_path = self._paths(method, url)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                content = f.read()
+        except (OSError, ValueError):
+            # Missing, or evicted by another worker between the two reads
+            return None
+        if self.mode == "record" and self.max_age is not None and time.time() - meta["fetched"] > self.max_age:
+            return None
+        return CachedResponse(url, meta["status"], meta["headers"], content)
+
+    def _write_meta(self, method, url, status_code, headers, size):
+        meta_path, body_path = self._paths(method, url)
+        meta = {
+            "method": method.upper(),
+            "url": url,
+            "status": status_code,
+            "headers": dict(headers),
+            "fetched": time.time(),
+            "size": size,
+        }
+        self._write(meta_path, json.dumps(meta).encode())
+        self._total += size
+        if self.max_bytes is not None and self._total > self.max_bytes:
+            self.evict()
+
+    def put(self, method, url, status_code, headers, content):
+        meta_path, body_path = self._paths(method, url)
+        self._write(body_path, content)
+        self._write_meta(method, url, status_code, headers, len(content))
+
+    def commit(self, tmp_path, url, status_code, headers, size):
+        """Moves a fully streamed body into place as the GET entry for url."""
+        meta_path, body_path = self._paths("GET", url)
+        os.replace(tmp_path, body_path)
+        self._write_meta("GET", url, status_code, headers, size)
+
+    def get(self, url, headers=None, validate=None, **kwargs):
+        """Drop-in for requests.get, extra keyword arguments go to requests on a real fetch.
+
+        validate(path) sees the finished body file and decides whether it is kept.
+        """
+        if self.mode == "off":
+            return requests.get(url, headers=headers, **kwargs)
+        if self.mode != "refresh":
+            cached = self.lookup("GET", url)
+            if cached is not None:
+                return cached
+            if self.mode == "replay":
+                return CachedResponse(url, 504, {}, b"")
+        kwargs["stream"] = True
+        response = requests.get(url, headers=headers, **kwargs)
+        # Only keep successes, errors are worth retrying next run
+        if response.status_code != 200:
+            return response
+        return RecordingResponse(self, url, response, validate)
+
+    def evict(self):
+        """Drops abandoned files, entries older than max_age, then the oldest ones until the cache fits in max_bytes."""
+        entries = []
+        now = time.time()
+        for folder, dirs, files in os.walk(self.root):
+            for fname in files:
+                path = os.path.join(folder, fname)
+                if fname.endswith(".tmp") or (
+                        fname.endswith(".body") and fname[:-len(".body")] + ".json" not in files):
+                    # Left by a crashed or killed writer, the age check spares ones still being written
+                    try:
+                        if now - os.path.getmtime(path) > orphan_age:
+                            os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if not fname.endswith(".json"):
+                    continue
+                meta_path = path
+                try:
+                    with open(meta_path, "r") as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if self.max_age is not None and now - meta["fetched"] > self.max_age:
+                    self._remove(meta_path)
+                else:
+                    entries.append((meta["fetched"], meta["size"], meta_path))
+        total = sum(size for _, size, _ in entries)
+        if self.max_bytes is not None and total > self.max_bytes:
+            for fetched, size, meta_path in sorted(entries):
+                if total <= self.max_bytes * low_water:
+                    break
+                self._remove(meta_path)
+                total -= size
+        self._total = total
+
+    def _remove(self, meta_path):
+        # Meta first so readers stop finding the entry before its body goes
+        for path in (meta_path, meta_path[:-len(".json")] + ".body"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Another worker got there first
+
+
+def add_cache_arguments(parser):
+    parser.add_argument("--cache", choices=modes, default="off", help="HTTP cache mode")
+    parser.add_argument("--cache-dir", default=cache_folder, help="HTTP cache folder")
+    parser.add_argument("--cache-max-age", type=float, default=None, help="evict entries older than this many days")
+    parser.add_argument("--cache-max-mb", type=float, default=None, help="evict oldest entries past this size")
+
+
+def cache_from_args(args):
+    max_age = args.cache_max_age * 86400 if args.cache_max_age is not None else None
+    max_bytes = int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb is not None else None
+    return HttpCache(args.cache_dir, args.cache, max_age, max_bytes)
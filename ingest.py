@@ -0,0 +1,82 @@
+import io
+import os
+import requests
+from PIL import Image
+
+max_dimension = 800  # Longest side of the 7.5" panel, nothing bigger is ever shown
+max_download = 20 * 1024 * 1024  # Give up on anything this large, no strip comes close
+
+# Leading bytes of each format we accept, the CDNs don't always match the URL or Content-Type
+magic_numbers = [
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+]
+
+
+def sniff_format(head):
+    """Returns the real extension for the first bytes of an image, or None."""
+    for magic, ext in magic_numbers:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def normalize(data):
+    """Decodes any accepted image once and returns it as a grayscale PNG no larger than the panel."""
+    if sniff_format(data[:12]) is None:
+        raise ValueError("Not a PNG, JPEG, GIF or WebP image")
+    img = Image.open(io.BytesIO(data))
+    # JPEGs can decode straight to grayscale at a fraction of the size
+    img.draft('L', (max_dimension, max_dimension))
+    img = img.convert('L')
+    img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def is_image_file(path):
+    # Cache validation, only real images under the size cap are worth replaying
+    with open(path, "rb") as f:
+        head = f.read(12)
+    return sniff_format(head) is not None and os.path.getsize(path) <= max_download
+
+
+def fetch_image(url, headers, cache=None):
+    """Streams an image download, returns its bytes or None if it isn't an image."""
+    if cache is not None:
+        response = cache.get(url, headers=headers, validate=is_image_file, stream=True, timeout=30)
+    else:
+        response = requests.get(url, headers=headers, stream=True, timeout=30)
+    with response:
+        if response.status_code != 200:
+            print(f"Failed to download image from {url}, status: {response.status_code}")
+            return None
+        data = bytearray()
+        for chunk in response.iter_content(8192):
+            if not data and sniff_format(chunk[:12]) is None:
+                # Error pages come back as 200 HTML, stop before reading the rest
+                print(f"Skipped {url}: not an image")
+                return None
+            data += chunk
+            if len(data) > max_download:
+                print(f"Skipped {url}: larger than {max_download} bytes")
+                return None
+    return bytes(data)
+
+
+def ingest_image(url, headers, store, series, index, cache=None):
+    """Downloads, normalizes and stores one strip, returns (blob hash, created) or None."""
+    data = fetch_image(url, headers, cache)
+    if data is None:
+        return None
+    try:
+        data = normalize(data)
+    except (OSError, ValueError) as e:
+        print(f"Skipped {url}: {e}")
+        return None
+    return store.add(series, index, data, ".png")
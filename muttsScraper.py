@@ -1,12 +1,15 @@
-import os
+import argparse
 import time
-import requests
+from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from urllib.parse import urljoin
+from comic_store import ComicStore
+from ingest import ingest_image
+from http_cache import add_cache_arguments, cache_from_args
 
 def setup_driver():
     """Set up and return a configured Chrome WebDriver."""
@@ -26,8 +29,19 @@ def get_better_quality_url(url):
         return f"{base_url}?width=1800&height=1800"
     return url
 
-def download_image(image_url, folder, filename):
-    """Download an image from a URL to a specified folder with a filename."""
+def parse_comic_images(page_source):
+    """Return the comic image URLs found in a rendered archive page."""
+    soup = BeautifulSoup(page_source, "html.parser")
+    urls = []
+    for img in soup.select("img.boost-sd__product-image-img"):
+        src = img.get("src")
+        # Skip the unrendered product-card templates
+        if src and "{{" not in src:
+            urls.append(urljoin("https://mutts.com/", src))
+    return urls
+
+def download_image(image_url, store, index, cache=None):
+    """Download an image from a URL into the store as mutts/index."""
     try:
         # Try to get a better quality version
         better_url = get_better_quality_url(image_url)
@@ -38,26 +52,51 @@ def download_image(image_url, folder, filename):
             "Referer": "https://mutts.com/"
         }
         
-        response = requests.get(better_url, stream=True, headers=headers)
-        if response.status_code == 200:
-            content_type = response.headers.get("Content-Type", "")
-            if "image" in content_type:
-                filepath = os.path.join(folder, filename)
-                with open(filepath, 'wb') as file:
-                    for chunk in response.iter_content(8192):
-                        file.write(chunk)
-                print(f"Downloaded: {filename}")
-            else:
-                print(f"Skipped: {filename} (Invalid Content-Type: {content_type})")
-        else:
-            print(f"Failed to download: {better_url} (Status code: {response.status_code})")
+        # Fetch large for a clean downscale, it is shrunk to panel size before being stored
+        stored = ingest_image(better_url, headers, store, "mutts", index, cache)
+        if stored:
+            blob_hash, created = stored
+            print(f"Downloaded: mutts #{index} as {blob_hash[:12]}{'' if created else ' (duplicate)'}")
     except Exception as e:
         print(f"Error downloading {image_url}: {e}")
 
-def scrape_mutts_comics(base_url, output_folder):
+def page_key(base_url, page_num):
+    # Pages come from clicking through the archive, so the page number stands in for a URL
+    return f"{base_url}#page={page_num}"
+
+def store_page(page_source, store, total, cache=None):
+    """Download every comic on one archive page, returns the next comic number."""
+    comics = parse_comic_images(page_source)
+    print(f"Found {len(comics)} images")
+    
+    for image_url in comics:
+        try:
+            index = total
+            total = total + 1
+            if not store.has("mutts", index):
+                download_image(image_url, store, index, cache)
+        except Exception as e:
+            print(f"Error processing comic: {e}")
+    return total
+
+def replay_mutts_comics(base_url, store, cache):
+    """Re-parse a recorded crawl from the cache without a browser."""
+    total = 1
+    page_num = 1
+    while True:
+        cached = cache.lookup("GET", page_key(base_url, page_num))
+        if cached is None:
+            print(f"No recorded page {page_num}, done")
+            break
+        print(f"Processing page {page_num}")
+        total = store_page(cached.text, store, total, cache)
+        page_num += 1
+
+def scrape_mutts_comics(base_url, store, cache=None):
     """Scrape all comics from the MUTTS website using Selenium."""
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    if cache is not None and cache.mode == "replay":
+        replay_mutts_comics(base_url, store, cache)
+        return
 
     driver = setup_driver()
     total = 1
@@ -80,18 +119,10 @@ def scrape_mutts_comics(base_url, output_folder):
                 break
 
             # Find and process all comic images on the current page
-            comics = driver.find_elements(By.CLASS_NAME, "boost-sd__product-image-img")
-            print(f"Found {len(comics)} images on page {page_num}")
-            
-            for comic in comics:
-                try:
-                    image_url = comic.get_attribute('src')
-                    if image_url:
-                        filename = f"{total}_mutts.png"
-                        total = total + 1
-                        download_image(image_url, output_folder, filename)
-                except Exception as e:
-                    print(f"Error processing comic: {e}")
+            page_source = driver.page_source
+            if cache is not None and cache.mode in ("record", "refresh"):
+                cache.put("GET", page_key(base_url, page_num), 200, {}, page_source.encode())
+            total = store_page(page_source, store, total, cache)
             
             # Try to find and click the next page button
             try:
@@ -113,6 +144,9 @@ def scrape_mutts_comics(base_url, output_folder):
         driver.quit()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the MUTTS strip archive into the library.")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
     base_url = "https://mutts.com/collections/comic-strips?sort=created-ascending"
-    output_folder = "mutts_comics"
-    scrape_mutts_comics(base_url, output_folder)
\ No newline at end of file
+    scrape_mutts_comics(base_url, ComicStore(), cache_from_args(args))
\ No newline at end of file
@@ -5,8 +5,27 @@ from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
 from waveshare_epd import epd7in5_V2
 
+def wrap_lines(text, lineLength=50):
+    # Ensure lines are wrapped at 50 characters
+    wrapped_text = []
+    for line in text:
+        line = line.expandtabs(4)
+        while len(line) > lineLength:
+            # Find the last space/comma/period within the limit
+            split_index = max(line.rfind(" ", 0, lineLength), line.rfind(",", 0, lineLength), line.rfind(".", 0, lineLength))
+            if split_index == -1:  # If no space/comma/period is found, split at the limit
+                split_index = lineLength
+            wrapped_text.append(line[:split_index + 1])  # Include the split character
+            line = line[split_index + 1:].lstrip()  # Remove the processed part and leading spaces
+        wrapped_text.append(line)  # Add the remaining part of the line
+    return wrapped_text
+
 class EpaperDisplay:
-    def __init__(self):
+    def __init__(self, epd=None):
+        # A passed in epd is shared with other displays and already initialised by its owner
+        if epd is not None:
+            self.epd = epd
+            return
         self.epd = epd7in5_V2.EPD()
         self.epd.init()
         
@@ -24,19 +43,7 @@ class EpaperDisplay:
         y_pos = 20
         line_height = font_size + 4
 
-        # Ensure lines are wrapped at 54 characters
-        wrapped_text = []
-        lineLength = 50
-        for line in text:
-            line = line.expandtabs(4)
-            while len(line) > lineLength:
-                # Find the last space/comma/period within the limit
-                split_index = max(line.rfind(" ", 0, lineLength), line.rfind(",", 0, lineLength), line.rfind(".", 0, lineLength))
-                if split_index == -1:  # If no space/comma/period is found, split at the limit
-                    split_index = lineLength
-                wrapped_text.append(line[:split_index + 1])  # Include the split character
-                line = line[split_index + 1:].lstrip()  # Remove the processed part and leading spaces
-            wrapped_text.append(line)  # Add the remaining part of the line
+        wrapped_text = wrap_lines(text)
 
         # Draw each line on the display
         for line in wrapped_text:
@@ -1,35 +1,84 @@
 import os
 import re
-import shutil
+from comic_store import ComicStore, link_or_copy
+from ingest import normalize
 
-source_dir = "./mnt"          # The directory containing *comics subfolders
+source_dir = "./mnt"          # Loose numbered files from before the store, imported once
 destination_dir = "./sorted"  # Where to place sorted folders
 
 # Regex to match files like "4_babyblues.png" where "4" is Y and "babyblues" is the comic name
 pattern = re.compile(r"^(\d+)_(.+)\.png$", re.IGNORECASE)
 
-files_by_y = {}
-
-# Walk the source directory and find files
-for root, dirs, files in os.walk(source_dir):
-    for fname in files:
-        match = pattern.match(fname)
-        if match:
-            y_str, comic_name = match.groups()
-            y_val = int(y_str)
-            file_path = os.path.join(root, fname)
-            # Group files by Y
-            files_by_y.setdefault(y_val, []).append(file_path)
-
-# Now create a single folder per Y and copy all files there
-for y_val, file_list in files_by_y.items():
+
+def strip_key(file_path):
+    """Returns (comic name, Y) for a numbered file, or None if it isn't one."""
+    match = pattern.match(os.path.basename(file_path))
+    if not match:
+        return None
+    y_str, comic_name = match.groups()
+    return comic_name, int(y_str)
+
+
+def import_loose_file(store, file_path):
+    """Pulls one numbered file into the store unless it already has it, returns True if imported."""
+    key = strip_key(file_path)
+    if key is None:
+        return False
+    comic_name, y_val = key
+    if store.has(comic_name, y_val):
+        return False
+    print(f"Importing {file_path}")
+    with open(file_path, "rb") as f:
+        data = f.read()
+    try:
+        store.add(comic_name, y_val, normalize(data))
+    except (OSError, ValueError) as e:
+        print(f"Skipped {file_path}: {e}")
+        return False
+    return True
+
+
+def day_file(comic_name, y_val, blob_path, destination=destination_dir):
     # Folder named after Y
-    out_folder = os.path.join(destination_dir, str(y_val))
-    os.makedirs(out_folder, exist_ok=True)
+    return os.path.join(destination, str(y_val), f"{y_val}_{comic_name}{os.path.splitext(blob_path)[1]}")
+
+
+def frame_file(day_path):
+    # Same place as comic_displayer.frame_path, without pulling in the panel driver
+    folder, name = os.path.split(day_path)
+    return os.path.join(folder, "frames", name)
+
+
+def place_strip(comic_name, y_val, blob_path, destination=destination_dir):
+    """Links a strip's blob into its day folder, returns the day file or None if it was already there."""
+    dest_path = day_file(comic_name, y_val, blob_path, destination)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+    if os.path.exists(dest_path) and os.path.samefile(blob_path, dest_path):
+        return None
+    print(f"Linking {blob_path} -> {dest_path}")
+    link_or_copy(blob_path, dest_path)
+    # A render of the strip this replaced is stale now, and with hard links its mtime can't tell
+    frame = frame_file(dest_path)
+    if os.path.exists(frame):
+        os.remove(frame)
+    return dest_path
+
+
+def main():
+    store = ComicStore()
+
+    # Walk the source directory and pull any files the store doesn't know yet into it
+    for root, dirs, files in os.walk(source_dir):
+        for fname in files:
+            import_loose_file(store, os.path.join(root, fname))
+
+    # Now create a single folder per Y and link every strip's blob there
+    for comic_name, y_val, blob_path in store.strips():
+        place_strip(comic_name, y_val, blob_path)
+
+    print("Sorting complete.")
 
-    for fpath in file_list:
-        dest_path = os.path.join(out_folder, os.path.basename(fpath))
-        print(f"Copying {fpath} -> {dest_path}")
-        shutil.copy(fpath, dest_path)
 
-print("Copying complete.")
+if __name__ == "__main__":
+    main()
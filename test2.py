@@ -165,15 +165,17 @@ class EinkImageProcessor:
         else:
             self.epd.Clear()
 
-# Usage example
-# Initialize with 4-gray mode enabled
-processor = EinkImageProcessor(use_4gray=True)
-
-# Display image
-processor.display_image("daily_comic_1.png")
-processor.clear()
-processor.display_image("sunday_comic_7.png")
-processor.clear()
-processor.epd.sleep()
+def main():
+    # Usage example
+    # Initialize with 4-gray mode enabled
+    processor = EinkImageProcessor(use_4gray=True)
 
+    # Display image
+    processor.display_image("daily_comic_1.png")
+    processor.clear()
+    processor.display_image("sunday_comic_7.png")
+    processor.clear()
+    processor.epd.sleep()
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from comic_store import ComicStore, store_folder
+from sort import day_file, destination_dir, frame_file, import_loose_file, place_strip, strip_key
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None  # Falls back to polling
+
+state_file = "watch_state.txt"  # Last store row already placed and rendered, kept in the store folder
+poll_interval = 2  # Seconds between checks when polling, or the longest inotify wait
+settle_time = 1  # A folder changed this recently may change again within the same mtime tick, so list it again
+
+
+def loose_folders():
+    """Folders the scrapers used to write numbered files into, other tools may still drop them there."""
+    return sorted(set(glob.glob("*_comics") + ["mutts_comics", "./mnt/calvin_hobbes_comics"]))
+
+
+def load_state(filename):
+    if not os.path.exists(filename):
+        return 0
+    with open(filename, "r") as f:
+        content = f.read().strip()
+        return int(content) if content.isdigit() else 0
+
+
+def save_state(filename, rowid):
+    with open(filename, "w") as f:
+        f.write(str(rowid))
+
+
+_processor = None
+
+
+def render_frame(image_path):
+    """Worker: renders the display-ready frame for one day file, returns its mode."""
+    global _processor
+    from comic_displayer import EinkImageProcessor, frame_path
+    if _processor is None:
+        from waveshare_epd import epd7in5_V2
+        # Only the panel size is needed, the EPD constructor doesn't touch the hardware
+        _processor = EinkImageProcessor(use_4gray=False, epd=epd7in5_V2.EPD())
+    use_4gray, final_image = _processor.prepare_frame(image_path)
+    out_path = frame_path(image_path)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    # Write then rename so the displayer never opens a half written frame
+    final_image.save(out_path + ".tmp", format="PNG")
+    os.replace(out_path + ".tmp", out_path)
+    return "4gray" if use_4gray else "2color"
+
+
+class Watcher:
+    def __init__(self, store, destination, pool):
+        self.store = store
+        self.destination = destination
+        self.pool = pool
+        # Rows are numbered per database, so the position belongs with it
+        self.state_path = os.path.join(store.root, state_file)
+        self.rowid = load_state(self.state_path)
+        self.folder_mtimes = {}  # Loose folder -> mtime when it was last listed
+        self.pending = {}  # Loose file that failed to import -> (size, mtime) it had then
+        self.watched = {}  # inotify watch descriptor -> loose folder
+
+    def import_new_files(self, paths):
+        for path in paths:
+            key = strip_key(path)
+            if key is None or self.store.has(*key):
+                self.pending.pop(path, None)
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self.pending.pop(path, None)
+                continue
+            # A file caught half written is tried again once its size or mtime changes
+            version = (stat.st_size, stat.st_mtime_ns)
+            if self.pending.get(path) == version:
+                continue
+            if import_loose_file(self.store, path):
+                self.pending.pop(path, None)
+            else:
+                self.pending[path] = version
+
+    def scan_folders(self):
+        for folder in loose_folders():
+            try:
+                mtime = os.stat(folder).st_mtime
+            except OSError:
+                continue
+            # Adding or renaming a file changes the folder's mtime, an unchanged folder has nothing new
+            if self.folder_mtimes.get(folder) == mtime:
+                continue
+            self.import_new_files(os.path.join(folder, name) for name in os.listdir(folder))
+            if time.time() - mtime > settle_time:
+                self.folder_mtimes[folder] = mtime
+        # Rewriting a file in place leaves its folder's mtime alone, so earlier failures are checked directly
+        self.import_new_files(list(self.pending))
+
+    def place_new_strips(self):
+        """Links and renders every strip stored since the last pass.
+
+        The saved row stops short of the first failed render, so it is retried on the next pass.
+        """
+        jobs = []
+        last = self.rowid
+        for rowid, series, index, blob_path in self.store.strips_since(self.rowid):
+            last = rowid
+            day_path = place_strip(series, index, blob_path, self.destination)
+            if day_path is None:
+                # Linked on an earlier pass, it still needs a frame if that render failed
+                day_path = day_file(series, index, blob_path, self.destination)
+                if os.path.exists(frame_file(day_path)):
+                    continue
+            jobs.append((rowid, day_path, self.pool.submit(render_frame, day_path)))
+        for rowid, day_path, job in jobs:
+            try:
+                print(f"Rendered {day_path} ({job.result()})")
+            except Exception as e:
+                print(f"Failed to render {day_path}: {e}")
+                # strips_since is exclusive, one below the failed row brings it back next time
+                last = min(last, rowid - 1)
+        if last != self.rowid:
+            self.rowid = last
+            save_state(self.state_path, last)
+
+    def poll(self):
+        print(f"Polling every {poll_interval}s")
+        while True:
+            self.scan_folders()
+            self.place_new_strips()
+            time.sleep(poll_interval)
+
+    def watch_new_folders(self, inotify):
+        """Adds watches for loose folders that appeared since the last call, returns whether any did."""
+        added = False
+        for folder in loose_folders():
+            if os.path.isdir(folder) and folder not in self.watched.values():
+                self.watched[inotify.add_watch(folder, flags.CLOSE_WRITE | flags.MOVED_TO)] = folder
+                print(f"Watching {folder}")
+                # Files written before the watch existed never raise an event
+                self.import_new_files(os.path.join(folder, name) for name in os.listdir(folder))
+                added = True
+        return added
+
+    def watch(self):
+        inotify = INotify()
+        # Every store write touches library.db, any change there means new rows to check
+        inotify.add_watch(self.store.root, flags.CLOSE_WRITE | flags.MOVED_TO | flags.MODIFY)
+        print(f"Watching {self.store.root}")
+        self.watch_new_folders(inotify)
+        while True:
+            events = inotify.read(timeout=poll_interval * 1000)
+            self.import_new_files(
+                os.path.join(self.watched[event.wd], event.name) for event in events if event.wd in self.watched)
+            self.import_new_files(list(self.pending))
+            # Scrapers create their folders on first run, look for new ones on every wake up
+            if self.watch_new_folders(inotify) or events:
+                self.place_new_strips()
+
+    def run(self):
+        # Catch up on anything that arrived while we weren't running
+        self.scan_folders()
+        self.place_new_strips()
+        if INotify is None:
+            self.poll()
+        else:
+            self.watch()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Place and render new strips as soon as they are stored.")
+    parser.add_argument("--store", default=store_folder, help="library folder")
+    parser.add_argument("--dest", default=destination_dir, help="day layout folder")
+    parser.add_argument("--workers", type=int, default=2, help="render processes")
+    parser.add_argument("--poll", action="store_true", help="poll even if inotify is available")
+    args = parser.parse_args()
+
+    global INotify
+    if args.poll:
+        INotify = None
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        try:
+            Watcher(ComicStore(args.store), args.dest, pool).run()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()